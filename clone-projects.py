@@ -1,92 +1,230 @@
 #! /usr/bin/env python3
 """Simple utility for cloning projects for mutation testing."""
 import os
-import sys
-import glob
-import json
+import hashlib
+import argparse
 import logging
-from shutil import rmtree, copytree
+import threading
+from uuid import uuid4
+from shutil import rmtree, copytree, copy2
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 import subprocess
 
-def remove_non_ascii(filepath):
-    cmd = "perl -pi -e 's/[^[:ascii:]]//g' {}".format(filepath)
-    result = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE)
-    result.check_returncode()
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
 
-def clone_project(projectpath, clonepath, package=True):
+# every non-ASCII byte; these are stripped from Java sources in the clone
+NON_ASCII = bytes(range(128, 256))
+
+def iter_java(dirpath):
+    """Yield the path of every .java file under dirpath. Like glob's '**',
+    hidden directories are skipped and symlinks aren't followed."""
+    stack = [dirpath]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith('.java'):
+                    yield entry.path
+
+HASHFILE = '.pit-source-hash'
+
+# prefix for directories waiting to be deleted by discard()
+TRASH_PREFIX = '.trash-'
+
+def discard(path):
+    """Rename the directory at path out of the way and delete it in the
+    background, so that a new clone can take its place straight away.
+
+    The deleting thread isn't a daemon, so the script waits for it to finish
+    before exiting.
+    """
+    trash = os.path.normpath(path)
+    dirpath, name = os.path.split(trash)
+    if not name.startswith(TRASH_PREFIX):
+        trash = os.path.join(dirpath, '{}{}-{}'.format(TRASH_PREFIX, name, uuid4().hex))
+        os.rename(path, trash)
+    threading.Thread(target=rmtree, args=(trash,), kwargs={'ignore_errors': True}).start()
+
+# Files and directories that are never needed in a clone: both build files
+# compile src/ against their own lib/ directory into a fresh bin/, so bundled
+# jars, compiled classes, and build output are dead weight
+IGNORED_NAMES = {'.git', 'node_modules'}
+IGNORED_SUFFIXES = ('.class', '.jar')
+# build output directories, only at the project root (src/build/ could be a package)
+IGNORED_ROOT_DIRS = {'bin', 'build', 'target'}
+
+def ignore_unneeded(projectpath):
+    """Return a copytree ignore function that skips files clones don't need."""
+    projectpath = os.path.normpath(projectpath)
+
+    def ignore(dirpath, names):
+        ignored = {name for name in names
+                   if name in IGNORED_NAMES or name.endswith(IGNORED_SUFFIXES)}
+        if os.path.normpath(dirpath) == projectpath:
+            ignored.update(IGNORED_ROOT_DIRS.intersection(names))
+        return ignored
+
+    return ignore
+
+def project_files(projectpath):
+    """Yield the paths, relative to projectpath, of the files that go into a
+    clone of the project. Symlinks to directories are yielded, not followed.
+    Raises OSError if a directory can't be read."""
+    ignore = ignore_unneeded(projectpath)
+    def onerror(err):
+        raise err
+    for root, dirs, files in os.walk(projectpath, onerror=onerror):
+        ignored = ignore(root, dirs + files)
+        links = [d for d in dirs if os.path.islink(os.path.join(root, d))]
+        dirs[:] = sorted(d for d in dirs if d not in ignored and d not in links)
+        for name in sorted(files + links):
+            if name not in ignored:
+                yield os.path.relpath(os.path.join(root, name), projectpath)
+
+def copy_project(projectpath, clonepath):
+    """Copy the files a clone needs (see project_files) from projectpath to
+    clonepath, which must not exist yet.
+
+    GNU cp shares blocks with the original on filesystems that support
+    reflinks, and otherwise copies in the kernel. Without it, fall back to
+    copytree.
+    """
+    relpaths = list(project_files(projectpath))
+    os.makedirs(clonepath)
+    try:
+        # a few hundred paths at a time keeps each command line well under ARG_MAX
+        for i in range(0, len(relpaths), 500):
+            # '--' so a file named like an option isn't taken for one
+            subprocess.run(['cp', '-a', '--reflink=auto', '--parents', '-t', clonepath, '--'] +
+                           relpaths[i:i + 500], cwd=projectpath,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+        return
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        rmtree(clonepath, ignore_errors=True)
+    copytree(projectpath, clonepath, symlinks=True, ignore=ignore_unneeded(projectpath),
+             copy_function=copy2)
+
+def source_hash(projectpath, package=True):
+    """Fingerprint the project at projectpath from the paths, sizes, and
+    modification times of the files that go into a clone. No file contents
+    are read."""
+    digest = hashlib.blake2b(b'package' if package else b'nopackage')
+    for relpath in project_files(projectpath):
+        stat = os.lstat(os.path.join(projectpath, relpath))
+        entry = '{}\0{}\0{}\n'.format(relpath, stat.st_size, stat.st_mtime_ns)
+        digest.update(entry.encode())
+    return digest.hexdigest()
+
+def clone_project(projectpath, clonepath, package=True, fresh=False):
     """Copy the project at projectpath to the specified clonepath.
 
+    Unless fresh is True, the clone is skipped if clonepath already holds a
+    clone of the project as it is now (see source_hash).
+
     Args:
         projectpath (str): Original path to the initial project
         clonepath (str): Path to be cloned to
         package (bool): Should com.example.* package structure be created?
                         This is needed for PIT testing, so that PIT doesn't
                         try to mutate itself.
+        fresh (bool): Re-clone the project even if it hasn't changed?
     """
+    try:
+        srchash = source_hash(projectpath, package=package)
+    except OSError as err:
+        logging.error('Could not read project at {}: {}'.format(projectpath, err))
+        return
+    hashpath = os.path.join(clonepath, HASHFILE)
+    try:
+        with open(hashpath) as infile:
+            if not fresh and infile.read() == srchash:
+                logging.info('{} is unchanged since it was last cloned'.format(projectpath))
+                return
+    except FileNotFoundError:
+        pass
+
     # Copy the project to /tmp/ to avoid modifying the original
     if os.path.exists(clonepath) and os.path.isdir(clonepath):
-        rmtree(clonepath)
-    copytree(projectpath, clonepath)
-    
-    javafiles = glob.glob(os.path.join(clonepath, '**', '*.java'), recursive=True)
-    for filepath in javafiles:
-        remove_non_ascii(filepath)
+        discard(clonepath)
+    copy_project(projectpath, clonepath)
     
+    # Strip non-ASCII characters from every Java file. If a com.example
+    # package structure is wanted, Java files directly under src are written
+    # straight into src/com/example with the package declaration on top, so
+    # each file is read and written only once
+    src = os.path.join(clonepath, 'src')
+    pkg = os.path.join(src, 'com', 'example')
+    javafiles = list(iter_java(clonepath))
     if package:
-        # Create com.example package structure
-        pkg = os.path.join(clonepath, 'src', 'com', 'example', '')
         os.makedirs(pkg)
 
-        # Move Java files directly under src into src/com/example
-        mvcmd = 'mv {javafiles} {package}' \
-                .format(javafiles=os.path.join(clonepath, 'src', '*.java'), package=pkg)
-        try:
-            result = subprocess.run(mvcmd, shell=True, stdout=subprocess.PIPE, 
-                                    stderr=subprocess.PIPE)
-            result.check_returncode()
-        except:
-            logging.error(('Could not create com.example package structure for '
-                            'project at {}').format(projectpath))
-            if result.stdout: logging.error(result.stdout)
-            if result.stderr: logging.error(result.stderr)
-
-        # Add package declaration to the top of Java files
-        sedcmd = 'gsed' if sys.platform == 'darwin' else 'sed' # requires GNU sed on macOS
-        sedcmd = sedcmd + " -i '1ipackage com.example;' {javafiles}" \
-                .format(javafiles=os.path.join(pkg, '*.java'))
-        try:
-            result = subprocess.run(sedcmd, shell=True, stdin=subprocess.PIPE,
-                                    stderr=subprocess.PIPE)
-            result.check_returncode()
-        except subprocess.CalledProcessError as err:
-            if err.returncode == 127 and sys.platform == 'darwin':
-                logging.error(('If you are on macOS, please install the GNU '
-                               'sed extension "gsed". To install: brew install gsed'))
-                sys.exit(0)
-            else:
-                logging.error('Could not clone project from {}'.format(projectpath))
-                if result.stdout: logging.error(result.stdout)
-                if result.stderr: logging.error(result.stderr)
+    npackaged = 0
+    for filepath in javafiles:
+        with open(filepath, 'rb') as javafile:
+            source = javafile.read().translate(None, NON_ASCII)
+        if package and os.path.dirname(filepath) == src:
+            os.remove(filepath)
+            filepath = os.path.join(pkg, os.path.basename(filepath))
+            source = b'package com.example;\n' + source
+            npackaged += 1
+        elif os.path.islink(filepath):
+            # cp -a keeps symlinks; replace the link rather than write through it
+            os.remove(filepath)
+        with open(filepath, 'wb') as javafile:
+            javafile.write(source)
+
+    if package and not npackaged:
+        logging.error(('Could not create com.example package structure for '
+                        'project at {}: no Java files in src/').format(projectpath))
+        return
+
+    with open(hashpath, 'w') as outfile:
+        outfile.write(srchash)
 
 if __name__ == '__main__':
-    ARGS = sys.argv[1:]
-    if not ARGS:
-        print('Error! No args')
-        sys.exit(1)
-    
+    parser = argparse.ArgumentParser(
+            description=('Clone projects from a taskFile into $PIT_WORKDIR '
+                        '(default /tmp/mutation-testing) for mutation testing.')
+        )
+    parser.add_argument('taskfile',
+                        help=('Path to an NDJSON file containing project tasks. Each task should '
+                            'have the key "projectPath", pointing to a project to clone.'))
+    parser.add_argument('-p', '--package', action='store_true',
+                        help=('if given, move Java files directly under src/ into a com.example '
+                            'package (needed for PIT).'))
+    parser.add_argument('-f', '--fresh', action='store_true',
+                        help='if given, re-clone projects even if they are unchanged since the last clone.')
+    args = parser.parse_args()
+
     logging.basicConfig(filename='.log-clone', filemode='w', level=logging.WARN)
 
-    outerdir = os.path.join('/', 'tmp', 'mutation-testing')
-    if os.path.exists(outerdir) and os.path.isdir(outerdir):
-        rmtree(outerdir)
-
-    taskfile = ARGS[0]
-    package = '-p' in ARGS
-    with open(taskfile) as infile:
-        for task in infile:
-            opts = json.loads(task)
-            projectpath = opts['projectPath']
-            clonepath = os.path.join(outerdir, os.path.basename(projectpath))
-            clone_project(projectpath, clonepath, package=package)
+    outerdir = os.environ.get('PIT_WORKDIR', os.path.join('/', 'tmp', 'mutation-testing'))
+    os.makedirs(outerdir, exist_ok=True)
+
+    with open(args.taskfile, 'rb') as infile:
+        projectpaths = [loads(task)['projectPath'] for task in infile]
+
+    # unchanged clones are reused; drop clones of projects not in this taskfile
+    projectnames = {os.path.basename(os.path.normpath(p)) for p in projectpaths}
+    for name in os.listdir(outerdir):
+        # hidden entries hold pit-runner.py's history files and report cache,
+        # apart from any trash an interrupted run didn't finish deleting
+        if name.startswith(TRASH_PREFIX) or (name not in projectnames and not name.startswith('.')):
+            stale = os.path.join(outerdir, name)
+            if os.path.isdir(stale):
+                discard(stale)
+            else:
+                os.remove(stale)
+
+    # cloning is mostly waiting on cp and disk I/O, so clone several projects at once
+    clonepaths = [os.path.join(outerdir, os.path.basename(p)) for p in projectpaths]
+    with ThreadPoolExecutor() as executor:
+        list(executor.map(partial(clone_project, package=args.package, fresh=args.fresh), projectpaths, clonepaths))
 
@@ -29,9 +29,47 @@ import shutil
 import logging
 import argparse
 import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
 
 ENGINE = 'mujava'
 
+# muJava is run from this directory, so these are the same for every project
+_CWD = os.getcwd()
+_ANTPATH = os.path.join(_CWD, 'build.xml')
+_LIBPATH = os.path.join(_CWD, 'lib')
+_MUJAVA_CLASSPATH = ':'.join(
+    os.path.join(_LIBPATH, jar)
+    for jar in ('mujava.jar', 'openjava.jar', 'commons-io.jar', 'junit.jar', 'student.jar')
+) + ':' + os.path.join(os.environ.get('JAVA_HOME', ''), 'lib', 'tools.jar')
+
+# resolved once rather than by a shell for every command
+_ANT = shutil.which('ant') or 'ant'
+_JAVA = shutil.which('java') or 'java'
+
+# projects are cloned here before they are mutated
+_OUTERDIR = os.path.normpath('/tmp/mujava-testing')
+
+def _run(cmd, **kwargs):
+    """subprocess.run, except that a command that can't be started (e.g. ant
+    or java isn't installed) fails with returncode 127, as it would in a shell,
+    rather than raising."""
+    try:
+        return subprocess.run(cmd, **kwargs)
+    except OSError as err:
+        logging.error('Could not run %s: %s', cmd[0], err)
+        return subprocess.CompletedProcess(cmd, 127, stdout='',
+                                           stderr='Could not run {}: {}\n'.format(cmd[0], err))
+
+def _run_for_project(task):
+    projectname = os.path.basename(os.path.normpath(task['projectPath']))
+    runner = MutationRunner(os.path.join(_OUTERDIR, projectname))
+    return runner.run()
+
 class MutationRunner:
     """Runs muJava mutation testing on a specified project.
     
@@ -46,15 +84,11 @@ class MutationRunner:
     def __init__(self, projectpath):
         self.projectpath = os.path.normpath(projectpath)
         self.projectname = os.path.basename(self.projectpath)
-        self.clonepath = os.path.join('/tmp/mujava-testing', self.projectname, '')
+        self.clonepath = '/tmp/mujava-testing/{}/'.format(self.projectname)
 
-        cwd = os.getcwd()
-        self.antpath = os.path.join(cwd, 'build.xml')
-        self.libpath = os.path.join(cwd, 'lib')
-        self.mujava_classpath = ('{libdir}/mujava.jar:{libdir}/openjava.jar:'
-                                 '{libdir}/commons-io.jar:{libdir}/junit.jar:'
-                                 '{libdir}/student.jar:$JAVA_HOME/lib/tools.jar'
-                                ).format(libdir=self.libpath)
+        self.antpath = _ANTPATH
+        self.libpath = _LIBPATH
+        self.mujava_classpath = _MUJAVA_CLASSPATH
 
         self.gentime = None
         self.runtime = None
@@ -135,15 +169,21 @@ class MutationRunner:
         Returns:
             (bool): was the compilation successful?
         """
-        antcmd = 'ant -f {} -Dresource_dir={} -Dbasedir={} clean compile' \
-                    .format(self.antpath, self.libpath, self.clonepath) 
-        logging.info('Compiling: {}'.format(antcmd))
+        antcmd = [
+            _ANT, '-f', self.antpath,
+            '-Dresource_dir={}'.format(self.libpath),
+            '-Dbasedir={}'.format(self.clonepath),
+            'clean', 'compile'
+        ]
+        logging.info('Compiling: %s', ' '.join(antcmd))
         stdoutpath = os.path.join(self.clonepath, 'compile.log')
         with open(stdoutpath, 'w') as outfile:
-            result = subprocess.run(antcmd, shell=True, cwd=self.clonepath, stdout=outfile, 
-                                    stderr=subprocess.STDOUT, universal_newlines=True)
+            result = _run(antcmd, cwd=self.clonepath, stdout=outfile,
+                          stderr=subprocess.STDOUT, universal_newlines=True)
+            if result.stderr:
+                outfile.write(result.stderr)
         if result.returncode == 0:
-            logging.info('Compiled {}'.format(self.projectname))
+            logging.info('Compiled %s', self.projectname)
             return True 
         else:
             msg = 'There was an error compiling {}. See the compile log at {}'\
@@ -167,7 +207,7 @@ class MutationRunner:
 
         # make session directory structure
         sesh_path = os.path.join(self.clonepath, self.sessionname)
-        logging.info('Creating test session at {}'.format(sesh_path))
+        logging.info('Creating test session at %s', sesh_path)
         if os.path.exists(sesh_path):
             shutil.rmtree(sesh_path)
 
@@ -181,25 +221,23 @@ class MutationRunner:
         os.makedirs(sesh_resultpath)
 
         # mv src files into place
-        srcfiles = self.__javafiles()
+        srcfiles, _ = self.__javafiles()
         for filepath in srcfiles:
             filename = os.path.basename(filepath)
             dest = os.path.join(sesh_srcpath, filename)
             shutil.copy(filepath, dest)
 
-        # mv source class files into place
-        classfiles = self.__javafiles(dirname='classes')
+        # mv source and test class files into place
+        classfiles, testfiles = self.__javafiles(dirname='classes')
         for filepath in classfiles:
             filename = os.path.basename(filepath)
             dest = os.path.join(sesh_clspath, filename)
-            shutil.copy(filepath, dest)
+            self.__linkfile(filepath, dest)
 
-        # mv test class files into place
-        testfiles = self.__javafiles(test=True, dirname='classes')
         for filepath in testfiles:
             filename = os.path.basename(filepath)
             dest = os.path.join(sesh_tstpath, filename)
-            shutil.copy(filepath, dest)
+            self.__linkfile(filepath, dest)
 
     def genmutes(self):
         """
@@ -209,22 +247,22 @@ class MutationRunner:
             (bool, float): Success and running time in seconds
         """
         # generate mutants
-        mutators = ' '.join(list(map(lambda m: '-{}'.format(m), self.mutators)))
+        mutators = ['-{}'.format(m) for m in self.mutators]
         start = time.time()
-        genmutescmd = 'java -cp {} mujava.cli.genmutes {} {}'\
-                      .format(self.mujava_classpath, mutators, self.sessionname)
-        logging.info('Generating mutants: {}'.format(genmutescmd))
-        result = subprocess.run(genmutescmd, cwd=self.clonepath, shell=True,
-                                stderr=subprocess.PIPE, stdout=subprocess.PIPE,
-                                universal_newlines=True)
+        genmutescmd = [_JAVA, '-cp', self.mujava_classpath, 'mujava.cli.genmutes'] + \
+                      mutators + [self.sessionname]
+        logging.info('Generating mutants: %s', ' '.join(genmutescmd))
+        result = _run(genmutescmd, cwd=self.clonepath,
+                      stderr=subprocess.PIPE, stdout=subprocess.PIPE,
+                      universal_newlines=True)
         runningtime = time.time() - start
         if result.returncode == 0:
-            logging.info(result.stdout)
+            logging.info('%s', result.stdout)
             return (True, runningtime)
         else:
-            logging.error(result.stdout)
-            logging.error(result.stderr)
-            return (False, runningTime)
+            logging.error('%s', result.stdout)
+            logging.error('%s', result.stderr)
+            return (False, runningtime)
 
     def runmutes(self):
         """
@@ -282,19 +320,23 @@ class MutationRunner:
         shutil.copy(mutantsrc, os.path.join(tmpdir, mutantclass))
         
         # run junit tests using the new set of classfiles
-        antcmd = ('ant -f {} -Dbasedir={} -Dresource_dir={} run') \
-                 .format(self.antpath, self.clonepath, self.libpath)
-        logging.info('Running mutant: {}'.format(antcmd))
+        antcmd = [
+            _ANT, '-f', self.antpath,
+            '-Dbasedir={}'.format(self.clonepath),
+            '-Dresource_dir={}'.format(self.libpath),
+            'run'
+        ]
+        logging.info('Running mutant: %s', ' '.join(antcmd))
         stdoutpath = os.path.join(self.clonepath, 'runmutes.log')
-        result = subprocess.run(antcmd, cwd=self.clonepath, shell=True,
-                                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                universal_newlines=True)
+        result = _run(antcmd, cwd=self.clonepath,
+                      stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                      universal_newlines=True)
         
 
         stdoutpath = os.path.join(self.clonepath, 'runmutes.log')
         with open(stdoutpath, 'a') as outfile:
             if result.returncode == 0:
-                logging.info('Ran mutant {} for project {}'.format(mutantdir, self.projectname))
+                logging.info('Ran mutant %s for project %s', mutantdir, self.projectname)
                 # write ANT output
                 outfile.write('Running mutant {} for project {}\n'.format(mutantdir, self.projectname))
                 outfile.write(result.stdout)
@@ -324,23 +366,35 @@ class MutationRunner:
                     mutated.append(mutant)
         return mutated
 
-    def __javafiles(self, test=False, dirname='src'):
-       src = os.path.join(self.clonepath, dirname)
-       javafiles = []
-       if dirname == 'src':
-           expext = '.java'
-       elif dirname == 'classes':
-           expext = '.class'
-
-       for root, _, files in os.walk(src):
-           for filename in files:
-               name, ext = os.path.splitext(filename)
-               if ext == expext:
-                   if test and name.endswith('Test'):
-                       javafiles.append(os.path.join(root, filename))
-                   elif not test and not name.endswith('Test'):
-                       javafiles.append(os.path.join(root, filename))
-       return javafiles
+    @staticmethod
+    def __linkfile(src, dest):
+        # class files are never modified in the session, so a hard link (one
+        # syscall) does the job of a full copy
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copy(src, dest)
+
+    def __javafiles(self, dirname='src'):
+        """Walk dirname once and split its Java files into (non-tests, tests)."""
+        src = os.path.join(self.clonepath, dirname)
+        if dirname == 'src':
+            expext = '.java'
+        elif dirname == 'classes':
+            expext = '.class'
+        testsuffix = 'Test' + expext
+
+        javafiles = []
+        testfiles = []
+        for root, _, files in os.walk(src):
+            for filename in files:
+                if not filename.endswith(expext):
+                    continue
+                if filename.endswith(testsuffix):
+                    testfiles.append(os.path.join(root, filename))
+                else:
+                    javafiles.append(os.path.join(root, filename))
+        return (javafiles, testfiles)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
@@ -352,20 +406,28 @@ if __name__ == '__main__':
                                 to a project target for mutation.')
     parser.add_argument('-l', '--log', action='store_const', const=logging.INFO, 
                         default=logging.WARN, help='if given, sets log level to INFO')
+    parser.add_argument('-j', '--jobs', type=int, nargs='?', default=1,
+                        const=max(1, (os.cpu_count() or 1) // 2),
+                        help=('number of projects to mutate in parallel. Defaults to 1, or to half '
+                            'the number of CPUs if given without a value.'))
     if sys.argv[1:]:
         args = parser.parse_args()
         loglevel = args.log
         logging.basicConfig(filename='.log', filemode='w', level=loglevel)
         taskfile = args.taskfile
-        outerdir = os.path.normpath('/tmp/mujava-testing')
-        with open(taskfile, 'r') as infile:
-            for line in infile:
-                task = json.loads(line)
-                projectpath = task['projectPath']
-                projectname = os.path.basename(projectpath)
-                runner = MutationRunner(os.path.join(outerdir, projectname))
-                output = runner.run()
-                print(json.dumps(output))
+        with open(taskfile, 'rb') as infile:
+            tasks = [loads(line) for line in infile]
+
+        if args.jobs > 1:
+            # each project is compiled and mutated in its own clone, so they
+            # can run side by side
+            with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+                futures = [executor.submit(_run_for_project, task) for task in tasks]
+                for future in as_completed(futures):
+                    print(json.dumps(future.result()), flush=True)
+        else:
+            for task in tasks:
+                print(json.dumps(_run_for_project(task)), flush=True)
     else:
         print('Error! Need a taskfile')
         parser.print_help()
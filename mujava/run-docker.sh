@@ -1,10 +1,8 @@
-if [[ $1 ]]; then
-  projdir=$1
-else
-  projdir=/tmp/mujava-testing
-fi
+# the muJava runner (and the image, see PROJDIR in the Dockerfile) always
+# mutates projects in /tmp/mujava-testing, so clone them there
+projdir=/tmp/mujava-testing
 
-../clone-projects.py tasks.ndjson && \
+PIT_WORKDIR=$projdir ../clone-projects.py tasks.ndjson && \
    docker build -t mujava-app . && \
      docker run \
      -v ${projdir}:${projdir} \
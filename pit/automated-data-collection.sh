@@ -11,8 +11,9 @@ cd pit/
 
 #Handling outputs generated
 mkdir -p $2
-cd /tmp/mutation-testing/
-find . -name 'mutations.csv' -exec cp --parents \{\} $2 \;
+cd ${PIT_WORKDIR:-/tmp/mutation-testing}/
+# skip hidden entries: the report cache, PIT history, and clones being deleted
+find . -path './.*' -prune -o -name 'mutations.csv' -exec cp --parents \{\} $2 \;
 
 mv ~/code/forked/mutation-testing/pit/mutation-results.ndjson $2
 mv ~/code/forked/mutation-testing/pit/.log-pit $2/log-pit.txt
@@ -14,7 +14,6 @@ Mutation testing dependencies:
  - ANT (https://ant.apache.org)
  - PIT (http://pitest.org)
  - see lib/ for required jars to get PIT running
- - (on macOS) brew install gsed
 
 Usage:
  - Run as a CLI tool on one or more projects using a task file.
@@ -23,24 +22,77 @@ Usage:
 import os
 import re
 import sys
-import json
 import time
+import signal
+import hashlib
+import faulthandler
 import subprocess
 import logging
+import logging.handlers
 import argparse
-from shutil import rmtree, copytree
+import multiprocessing
+from contextlib import contextmanager
+from functools import lru_cache
+from shutil import rmtree, copytree, which
 
 import utils
 
+try:
+    from orjson import loads, dumps as _dumps
+
+    def dumps(obj):
+        return _dumps(obj).decode()
+except ImportError:
+    from json import loads, dumps
+
+# paths to the ANT build file and PIT jars are the same for every project
+_WD = os.path.abspath(os.path.dirname(__file__))
+_ANTPATH = os.path.join(_WD, 'build.xml')
+_LIBPATH = os.path.join(_WD, 'lib')
+
+# resolved once rather than on every PIT run
+_ANT = which('ant') or 'ant'
+
+# ANT only orchestrates the build (the pitest task forks its own JVM for the
+# analysis), so the short-lived ANT JVM is started with the cheaper C1-only JIT.
+# Any ANT_OPTS set by the user are appended and take precedence.
+_ANT_OPTS = '-XX:+TieredCompilation -XX:TieredStopAtLevel=1 -Xshare:auto -XX:+IgnoreUnrecognizedVMOptions'
+
+# AppCDS archive of the classes ANT loads at startup. The first run dumps it
+# on exit (JDK 13+, older JDKs ignore the flag) and later runs map it in
+# rather than loading and verifying those classes again.
+_CDS_ARCHIVE = os.path.join(_LIBPATH, 'ant-cds.jsa')
+
+# projects are cloned here by clone-projects.py; point PIT_WORKDIR at a tmpfs
+# mount to keep PIT's compiled classes and reports off the disk
+_WORKDIR = os.environ.get('PIT_WORKDIR', '/tmp/mutation-testing')
+
+# PIT's incremental analysis state for each project. It lives outside the
+# clones so that re-cloning a changed project (exactly when the history is
+# useful) doesn't throw it away; clone-projects.py leaves hidden entries alone.
+_HISTORYDIR = os.path.join(_WORKDIR, '.pit-history')
+
+# PIT reports, keyed by the contents of the project and the PIT setup that
+# produced them (see MutationRunner.cachekey)
+_CACHEDIR = os.environ.get('PIT_CACHE', os.path.join(_WORKDIR, '.pit-cache'))
+
+# files and directories in a clone that ANT, PIT, or this script write
+_GENERATED = {'bin', 'reports', 'pitReports', 'pit.log'}
+
 def main(args):
     """Entry point. Respond to CLI args and trigger execution."""
     loglevel = args.log
     logging.basicConfig(filename='.log-pit', filemode='w', level=loglevel)
+    # dump a traceback if the runner itself crashes or hangs on a fatal signal
+    faulthandler.enable()
 
     taskfile = args.taskfile
-    run(taskfile, args.mutators, args.targetclasses, args.excludetargetclasses, args.excludetargettests)
+    run(taskfile, args.mutators, args.targetclasses, args.excludetargetclasses, args.excludetargettests,
+        jobs=args.jobs, steps=args.steps, pit_threads=args.pit_threads, cache=args.cache,
+        timeout=args.timeout or None)
 
-def run(taskfile, mutators='all', targetclasses=None, exclude_class=None, exclude_test=None):
+def run(taskfile, mutators='all', targetclasses=None, exclude_class=None, exclude_test=None, jobs=1,
+        steps=False, pit_threads=None, cache=True, timeout=None):
     """Trigger mutation testing and respond to output.
 
     Output is printed to the console in the form of a stringified dict.
@@ -51,13 +103,72 @@ def run(taskfile, mutators='all', targetclasses=None, exclude_class=None, exclud
                              names to mutate
         exclude_class (str): Java globs of classes that should NOT be mutated
         exclude_test (str): Java globs of tests that should NOT be checked
+        jobs (int): Number of projects to mutate concurrently
+        steps (bool): Report coverage separately for each mutation operator?
+        pit_threads (int): Number of threads each PIT run uses. Defaults to an
+                           even share of the CPUs between the jobs.
+        cache (bool): Reuse PIT reports for projects that have already been
+                      mutated with the same settings?
+        timeout (float): Seconds after which a project's PIT run is killed and
+                         counted as failed. None for no limit.
     """
-    with open(taskfile) as infile:
-        for line in infile:
-            __run_for_project(line, mutators, targetclasses, exclude_class, exclude_test)
-
-def __run_for_project(task, mutators, targetclasses, exclude_class, exclude_test):
-    opts = json.loads(task)
+    with open(taskfile, 'rb') as infile:
+        tasks = [loads(line) for line in infile]
+
+    # each project already gets its own PIT JVM, so don't let every one of
+    # them also spin up a thread per core
+    threads = pit_threads or max(1, (os.cpu_count() or 1) // jobs)
+    cachedir = _CACHEDIR if cache else None
+    runargs = (mutators, targetclasses, exclude_class, exclude_test, threads, steps, cachedir,
+               timeout)
+
+    if jobs > 1:
+        # start the biggest projects first so a long one isn't left running
+        # alone at the end while the other workers sit idle
+        tasks.sort(key=_sourcesize, reverse=True)
+        initargs = (logging.getLogger().level,)
+        with _queued_logging() as queue, \
+                multiprocessing.Pool(jobs, _log_to_queue, (queue,) + initargs) as pool:
+            for output in pool.imap_unordered(_run_task, [(task,) + runargs for task in tasks]):
+                print(dumps(output), flush=True)
+            # let the workers exit, flushing their last log records, before
+            # the listener stops
+            pool.close()
+            pool.join()
+    else:
+        for task in tasks:
+            print(dumps(_run_for_project(task, *runargs)), flush=True)
+
+@contextmanager
+def _queued_logging():
+    """Yield a queue whose log records go to the root logger's handlers, so
+    that worker processes (see _log_to_queue) don't interleave their writes
+    to the log file."""
+    queue = multiprocessing.Queue(-1)
+    listener = logging.handlers.QueueListener(queue, *logging.getLogger().handlers,
+                                              respect_handler_level=True)
+    listener.start()
+    try:
+        yield queue
+    finally:
+        listener.stop()
+
+def _log_to_queue(queue, level):
+    """Worker initializer: send the worker's log records to the queue from
+    _queued_logging. Forked workers drop the handlers they inherit, and
+    spawned ones, which have none, pick up the parent's log level."""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(queue))
+    root.setLevel(level)
+
+def _run_task(args):
+    # Pool.imap_unordered passes a single argument
+    return _run_for_project(*args)
+
+def _run_for_project(opts, mutators, targetclasses, exclude_class, exclude_test, threads, steps,
+                     cachedir, timeout):
     projectpath = opts['projectPath']
     logging.info('Starting for %s', projectpath)
     runner = MutationRunner(
@@ -65,32 +176,109 @@ def __run_for_project(task, mutators, targetclasses, exclude_class, exclude_test
         mutators=mutators,
         targetclasses=targetclasses,
         exclude_class=exclude_class,
-        exclude_test=exclude_test
+        exclude_test=exclude_test,
+        threads=threads,
+        cachedir=cachedir,
+        timeout=timeout
     )
-    mutationoutput = runner.testsingleproject()
+    mutationoutput = runner.testsingleproject(steps=steps)
 
     # mutationoutput is a tuple
     coverage, result, runningtime = mutationoutput
     if result.returncode == 0:
         output = {
             'success': True,
-            'projectPath': opts['projectPath'],
+            'projectPath': projectpath,
             'runningTime': runningtime,
             'coverage': coverage
             }
-        print(json.dumps(output))
+        if runner.cachedtime is not None:
+            # runningTime is that of the PIT run the reports were cached from
+            output['cached'] = True
         logging.info('%s: %s set', runner.projectname, mutators)
-        logging.info(result.stdout)
+        logging.info('ANT output written to %s', runner.logpath)
     else:
         output = {
             'success': False,
-            'projectPath': opts['projectPath'],
+            'projectPath': projectpath,
             'runningTime': runningtime
             }
-        print(json.dumps(output))
         logging.error('%s: %s set', runner.projectname, mutators)
-        logging.error(result.stdout)
-        logging.error(result.stderr)
+        logtail = runner.logtail()
+        if logtail:
+            logging.error('ANT output written to %s. Last lines:', runner.logpath)
+            logging.error('%s', logtail)
+    return output
+
+def _sourcesize(opts):
+    """Total size of the Java sources in the clone of a task's project."""
+    projectname = os.path.basename(os.path.normpath(os.path.expanduser(opts['projectPath'])))
+    src = os.path.join(_WORKDIR, projectname, 'src')
+    return sum(entry.stat().st_size for _, entry in _iter_java(src))
+
+def _ant_env():
+    if os.path.isfile(_CDS_ARCHIVE):
+        cdsopt = '-XX:SharedArchiveFile={}'.format(_CDS_ARCHIVE)
+    else:
+        cdsopt = '-XX:ArchiveClassesAtExit={}'.format(_cds_dumppath())
+    antopts = ' '.join(filter(None, [_ANT_OPTS, cdsopt, os.environ.get('ANT_OPTS')]))
+    return dict(os.environ, ANT_OPTS=antopts)
+
+def _cds_dumppath():
+    # parallel workers may all dump an archive; each writes its own
+    return '{}.{}'.format(_CDS_ARCHIVE, os.getpid())
+
+def _save_cds_archive():
+    """Move an archive dumped by the last ANT run into place, if there is one."""
+    try:
+        os.replace(_cds_dumppath(), _CDS_ARCHIVE)
+    except OSError:
+        pass
+
+@lru_cache(maxsize=None)
+def _tooling_digest():
+    """Digest of the ANT build file and PIT jars, which affect PIT's results
+    as much as the project does."""
+    digest = hashlib.blake2b()
+    for path in [_ANTPATH] + sorted(os.path.join(_LIBPATH, name) for name in os.listdir(_LIBPATH)
+                                    if name.endswith('.jar')):
+        with open(path, 'rb') as infile:
+            digest.update(os.path.basename(path).encode() + b'\0' + infile.read())
+    return digest.digest()
+
+def _iter_inputs(clonepath):
+    """Yield the path of every file in a clone that isn't generated by a PIT
+    run or hidden, in a stable order."""
+    stack = [clonepath]
+    while stack:
+        dirpath = stack.pop()
+        with os.scandir(dirpath) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name, reverse=True)
+        for entry in entries:
+            if entry.name.startswith('.') or (dirpath == clonepath and entry.name in _GENERATED):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            else:
+                yield entry.path
+
+def _iter_java(src):
+    """Yield (package name, DirEntry) for every .java file under src, without
+    following symlinks. The package name is built up from the directory names
+    on the way down."""
+    stack = [(src, '')]
+    while stack:
+        dirpath, packagename = stack.pop()
+        try:
+            with os.scandir(dirpath) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subpackage = '{}.{}'.format(packagename, entry.name) if packagename else entry.name
+                        stack.append((entry.path, subpackage))
+                    elif entry.name.endswith('.java'):
+                        yield packagename, entry
+        except FileNotFoundError:
+            continue
 
 class MutationRunner:
     """Runs PIT mutation testing on a specified project.
@@ -151,6 +339,14 @@ class MutationRunner:
         'EXPERIMENTAL_SWITCH'
     ]
 
+    # a PIT operator, optionally followed by a sub-mutator number (e.g., ROR5),
+    # or one of the named REMOVE_CONDITIONALS sub-mutators
+    mutator_pattern = re.compile(r'(?:{})\d*|REMOVE_CONDITIONALS_(?:EQUAL|ORDER)_(?:IF|ELSE)'.format(
+        '|'.join(map(re.escape, all_mutators))))
+
+    # filename pattern used by the excludeGUI rule
+    gui_or_test_pattern = re.compile(r'GUI|Window|Test')
+
     mutator_lists = {
         'all': all_mutators,
         'deletion': deletion_mutators,
@@ -159,10 +355,11 @@ class MutationRunner:
     }
 
     def __init__(self, projectpath, antpath=None, mutators='all', targetclasses='',
-                 exclude_class=None, exclude_test=None):
+                 exclude_class=None, exclude_test=None, threads=None, cachedir=None,
+                 timeout=None):
         self.projectpath = os.path.normpath(os.path.expanduser(projectpath))
         self.projectname = os.path.basename(self.projectpath)
-        self.clonepath = os.path.join('/tmp/mutation-testing', self.projectname, '')
+        self.clonepath = '{}/{}/'.format(_WORKDIR, self.projectname)
         self.mutators = self.mutator_lists.get(mutators, None)
         if not self.mutators:
             mutators = mutators.split(',')
@@ -187,118 +384,285 @@ class MutationRunner:
         self.targetclasses = targetclasses
         self.exclusion_class_rule = exclusion_class_rules[exclude_class]
         self.exclusion_test_rule  = exclusion_test_rules[exclude_test]
-        
-        wd = os.path.abspath(os.path.dirname(__file__))
-        self.antpath = antpath or os.path.join(wd, 'build.xml')
-        self.libpath = os.path.join(wd, 'lib')
+
+        self.antpath = antpath or _ANTPATH
+        self.libpath = _LIBPATH
+        # number of threads PIT uses to run mutants within its own JVM
+        self.threads = threads or os.cpu_count() or 1
+        # ANT and PIT output goes here rather than into memory
+        self.logpath = os.path.join(self.clonepath, 'pit.log')
+        # PIT's incremental analysis state, kept across runs and re-clones
+        self.historypath = os.path.join(_HISTORYDIR, self.projectname)
+        self.pitreports = os.path.join(self.clonepath, 'pitReports')
+        # target lists for ANT (see __mutate)
+        self.classesfile = os.path.join(self.clonepath, '.targets-classes')
+        self.testsfile = os.path.join(self.clonepath, '.targets-tests')
+        # reuse PIT reports from here, if given
+        self.cachedir = cachedir
+        # running time of the PIT run whose reports were reused from the cache,
+        # or None if PIT was run (set by __mutate)
+        self.cachedtime = None
+        # where to cache the reports of a successful PIT run (set by __mutate)
+        self._cachepath = None
+        # seconds before a PIT run is given up on, or None to wait indefinitely
+        self.timeout = timeout
+        # the parts of the ANT command that are the same for every PIT run
+        self._antcmd = [
+            _ANT, '-f', self.antpath,
+            '-Dbasedir={}'.format(self.clonepath),
+            '-Dresource_dir={}'.format(self.libpath),
+            '-Dtarget_classes_file={}'.format(self.classesfile),
+            '-Dtarget_tests_file={}'.format(self.testsfile),
+            '-Dpit_threads={}'.format(self.threads),
+            '-Dpit_history={}'.format(self.historypath)
+        ]
+        # (targetclasses, targettests), computed on first use
+        self._pittargets = None
+        # does the project have any test classes? set by getpittargets
+        self._hastests = False
 
     @classmethod
     def __check_mutators(cls, mutators):
-        r = '|'.join(['^{}'.format(m) for m in cls.all_mutators])
-        return all([re.match(r, s) for s in mutators])  
+        return all(cls.mutator_pattern.fullmatch(s) for s in mutators)
     
     @classmethod
     def __check_class_gui_window(cls, filename):
-        if not "java" in filename:
+        if not filename.endswith('.java'):
             # Default rule: if the file is not a java file, exclude it from testing
             return True
-        if "GUI" in filename or "Window" in filename or "Test" in filename:
-            return True
-        # Ignore this class anyway, it is a default behaviour for test exclusion functions if Test is not in there.
-        return False
+        # Ignore GUI classes, and tests (a default behaviour for class exclusion functions)
+        return cls.gui_or_test_pattern.search(filename) is not None
 
     @classmethod 
     def __check_test_InputReference(cls, filename):
-        if not "java" in filename:
+        if not filename.endswith('.java'):
             # Default rule: if the file is not a java file, exclude it from testing
             return True
         if "Test" in filename:
-            if "InputReference" in filename:
-                return True
-            else:
-                return False
+            return "InputReference" in filename
         #Ignore this class anyway, it is a default behaviour for test exclusion functions if Test is not in there.
         return True
 
-    def testsingleproject(self):
+    def testsingleproject(self, steps=False):
         """Run mutation testing on a single project.
 
-        Returns a (float, CompletedSubprocess, float)  tuple if all
-        supplied mutators are used, or a dict of (float, CompletedSubprocess, float)
-        tuples if mutators are applied one after the other, with each key being
-        the name of a mutation operator.
+        All supplied mutators are run in a single PIT invocation. If steps is True,
+        the resulting mutants are split up by mutation operator afterwards, so each
+        operator gets its own coverage without paying for a JVM startup per operator.
+
+        Args:
+            steps (bool): Report coverage separately for each mutation operator?
 
         Returns:
             (float, CompletedProcess, float): A tuple containing the coverage percentage, the
-                                              completed subprocess, and the running time, or
+                                              completed subprocess, and the running time.
+                                              If steps is True, the coverage is a dict of
+                                              percentages keyed by mutation operator, as
+                                              named in self.mutators.
         """
         start = time.time()
-        pitreports = os.path.join(self.clonepath, 'pitReports')
         mutators = ','.join(self.mutators)
-        result = self.__mutate(mutators, pitreports)
+        result = self.__mutate(mutators, self.pitreports)
         runningtime = time.time() - start
+        if self.cachedtime is not None:
+            # report how long PIT took to produce the reports, not how long
+            # it took to copy them out of the cache
+            runningtime = self.cachedtime
+        elif self._cachepath:
+            self.__cachereports(self.pitreports, self._cachepath, runningtime)
         # look for the CSV file PIT creates
-        coveragecsv = os.path.join(pitreports, 'mutations.csv')
+        coveragecsv = os.path.join(self.pitreports, 'mutations.csv')
+        if steps:
+            coverage = utils.get_mutation_coverage_by_mutator(coveragecsv, self.mutators)
+            if coverage is None:
+                return (None, result, runningtime)
+            coverage = {
+                mutator: results['mutationCovered']
+                for mutator, results in coverage.items()
+            }
+            return (coverage, result, runningtime)
+
         coverage = utils.get_mutation_coverage(coveragecsv)
         if coverage is None:
             return (None, result, runningtime)
         return (coverage['mutationCovered'], result, runningtime)
 
     def __mutate(self, mutators, pitreports):
+        if not os.path.isdir(self.clonepath):
+            logging.error('%s: no clone at %s; was it cloned with clone-projects.py?',
+                          self.projectname, self.clonepath)
+            return subprocess.CompletedProcess(args=[], returncode=2)
+
         if self.targetclasses:
             _, targettests = self.getpittargets()
         else:
             self.targetclasses, targettests = self.getpittargets()
 
-        antcmd = ('ant -f {} -Dbasedir={} -Dresource_dir={} -Dtarget_classes={} '
-                  '-Dtarget_tests={} -Dmutators={} -Dpit_reports={} pit') \
-                  .format(
-                      self.antpath,
-                      self.clonepath,
-                      self.libpath,
-                      self.targetclasses,
-                      targettests,
-                      mutators,
-                      pitreports
-                  )
-        logging.info('ANT command: %s', antcmd)
-        result = subprocess.run(antcmd, shell=True, stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE, encoding='utf-8')
+        # PIT needs something to mutate and at least one test to run against
+        # it, so don't pay for an ANT and PIT startup just to have it fail
+        if not self.targetclasses or not targettests or not self._hastests:
+            reason = 'No Java sources or tests found under {}'.format(os.path.join(self.clonepath, 'src'))
+            logging.warning('%s: %s', self.projectname, reason)
+            try:
+                with open(self.logpath, 'w') as logfile:
+                    logfile.write(reason + '\n')
+            except OSError as err:
+                # e.g. the clone was removed while the runner was walking it
+                logging.warning('%s: could not write %s: %s', self.projectname, self.logpath, err)
+            return subprocess.CompletedProcess(args=[], returncode=2)
+
+        cachepath = None
+        if self.cachedir:
+            cachepath = os.path.join(self.cachedir, self.cachekey(mutators, targettests))
+            try:
+                with open(os.path.join(cachepath, 'runningtime')) as infile:
+                    self.cachedtime = float(infile.read())
+            except (OSError, ValueError):
+                # clear out any incomplete entry, e.g. one cached without a running
+                # time, so that this run's reports can take its place
+                rmtree(cachepath, ignore_errors=True)
+            else:
+                logging.info('%s: using cached PIT reports from %s', self.projectname, cachepath)
+                if os.path.isdir(pitreports):
+                    rmtree(pitreports)
+                copytree(os.path.join(cachepath, 'pitReports'), pitreports)
+                with open(self.logpath, 'w') as logfile:
+                    logfile.write('Using cached PIT reports from {}\n'.format(cachepath))
+                return subprocess.CompletedProcess(args=[], returncode=0)
+
+        # target lists can outgrow ARG_MAX on big projects, so hand them to ANT
+        # in files (one glob per line) rather than on the command line
+        for targetsfile, targets in ((self.classesfile, self.targetclasses),
+                                     (self.testsfile, targettests)):
+            with open(targetsfile, 'w') as outfile:
+                outfile.write(targets.replace(',', ',\n'))
+
+        os.makedirs(_HISTORYDIR, exist_ok=True)
+        antcmd = self._antcmd + [
+            '-Dmutators={}'.format(mutators),
+            '-Dpit_reports={}'.format(pitreports),
+            'pit'
+        ]
+        logging.info('ANT command: %s', ' '.join(antcmd))
+        with open(self.logpath, 'w') as logfile:
+            # ANT gets its own process group, so that on a timeout the JVMs it
+            # and PIT fork are killed along with it
+            try:
+                proc = subprocess.Popen(antcmd, stdout=logfile, stderr=subprocess.STDOUT,
+                                        env=_ant_env(), start_new_session=True)
+            except OSError as err:
+                # e.g. ant isn't installed; fail this project, not the whole run
+                logging.error('%s: could not run %s: %s', self.projectname, antcmd[0], err)
+                logfile.write('Could not run {}: {}\n'.format(antcmd[0], err))
+                return subprocess.CompletedProcess(antcmd, 127)
+            try:
+                proc.wait(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                logging.error('%s: PIT run killed after %s seconds', self.projectname, self.timeout)
+                self.__killgroup(proc)
+                logfile.write('\nKilled after {} seconds\n'.format(self.timeout))
+            except BaseException:
+                # in its own session, ANT doesn't see the terminal's Ctrl-C, so
+                # don't leave it and its JVMs running when the runner is stopped
+                self.__killgroup(proc)
+                raise
+            result = subprocess.CompletedProcess(antcmd, proc.returncode)
+        _save_cds_archive()
+        if cachepath and result.returncode == 0 and os.path.isdir(pitreports):
+            self._cachepath = cachepath
         return result
 
+    @staticmethod
+    def __killgroup(proc):
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                os.killpg(proc.pid, signal.SIGKILL)
+                proc.wait()
+        except ProcessLookupError:
+            proc.wait()
+
+    def cachekey(self, mutators, targettests):
+        """Key PIT reports by everything that goes into them: the files in the
+        clone, the targets and mutators, and the build file and PIT jars."""
+        digest = hashlib.blake2b(_tooling_digest(), digest_size=32)
+        digest.update('\0'.join((mutators, self.targetclasses, targettests)).encode())
+        for path in _iter_inputs(self.clonepath):
+            digest.update(os.path.relpath(path, self.clonepath).encode() + b'\0')
+            if os.path.islink(path):
+                # clones keep symlinks, which may point at directories or nowhere
+                digest.update(b'->' + os.readlink(path).encode())
+                continue
+            with open(path, 'rb') as infile:
+                digest.update(infile.read())
+        return digest.hexdigest()
+
+    @staticmethod
+    def __cachereports(pitreports, cachepath, runningtime):
+        # the reports are kept with the running time of the run that made them.
+        # Copy next to the final location and rename it into place, so other
+        # workers never see a half-written entry
+        tmppath = '{}.{}'.format(cachepath, os.getpid())
+        try:
+            copytree(pitreports, os.path.join(tmppath, 'pitReports'))
+            with open(os.path.join(tmppath, 'runningtime'), 'w') as outfile:
+                outfile.write(repr(runningtime))
+            os.rename(tmppath, cachepath)
+        except OSError as err:
+            logging.warning('Could not cache PIT reports at %s: %s', cachepath, err)
+            rmtree(tmppath, ignore_errors=True)
+
+    def logtail(self, size=64 * 1024):
+        """Return the last size bytes of the ANT output from the latest PIT run,
+        or '' if there is none."""
+        try:
+            with open(self.logpath, 'rb') as logfile:
+                logfile.seek(0, os.SEEK_END)
+                logfile.seek(max(0, logfile.tell() - size))
+                return logfile.read().decode('utf-8', errors='replace')
+        except OSError:
+            return ''
+
     def getpittargets(self):
         """Walk down the dirtree starting at the project source and return code and
         test targets for PIT as Java class globs.
 
+        The clone doesn't change while the runner is alive, so the result is
+        cached after the first walk.
+
         Returns:
             (str, str). e.g. (com.example.*, com.example.*Test*)
         """
-        src = os.path.join(self.clonepath, 'src', '')
-        targetclasses = []
-        targettests = []
-        
+        if self._pittargets is not None:
+            return self._pittargets
+
+        src = os.path.join(self.clonepath, 'src')
+        targetclasses = set()
+        targettests = set()
+
         # finds Java source files recursively
-        for root, _, files in os.walk(src):
-            if files:
-                packagename = root.replace(src, '').replace(os.sep, '.')
-                if not self.exclusion_class_rule:
-                    targetclasses.append('{}.*'.format(packagename))
-                else:
-                    for filename in files:
-                        if not self.exclusion_class_rule(filename):
-                            targetclasses.append('{}.{}'.format(packagename,filename.replace(src, '').replace(os.sep, '.').replace('.java','')))
-
-                if not self.exclusion_test_rule:
-                    targettests.append('{}.*Test*'.format(packagename))
-                else:
-                    for filename in files:
-                        if not self.exclusion_test_rule(filename):
-                            targettests.append('{}.{}'.format(packagename,filename.replace(src, '').replace(os.sep, '.').replace('.java','')))
-
-        targetclasses = ','.join(targetclasses)
-        targettests = ','.join(targettests)
-
-        return (targetclasses, targettests)
+        for packagename, javafile in _iter_java(src):
+            if 'Test' in javafile.name:
+                self._hastests = True
+            classname = '{}.{}'.format(packagename, javafile.name[:-len('.java')])
+
+            if not self.exclusion_class_rule:
+                targetclasses.add('{}.*'.format(packagename))
+            elif not self.exclusion_class_rule(javafile.name):
+                targetclasses.add(classname)
+
+            if not self.exclusion_test_rule:
+                targettests.add('{}.*Test*'.format(packagename))
+            elif not self.exclusion_test_rule(javafile.name):
+                targettests.add(classname)
+
+        targetclasses = ','.join(sorted(targetclasses))
+        targettests = ','.join(sorted(targettests))
+
+        self._pittargets = (targetclasses, targettests)
+        return self._pittargets
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
@@ -314,6 +678,23 @@ if __name__ == '__main__':
                         help=('set of mutators to run: one of [all|default|deletion|sufficient] or '
                             'a list of comma-separated mutator names, as seen in the PIT documentation.'
                             ' Defaults to "deletion".'))
+    parser.add_argument('-s', '--steps', action='store_true',
+                        help=('if given, report mutation coverage separately for each mutation '
+                            'operator. All operators are still run in a single PIT invocation.'))
+    parser.add_argument('-j', '--jobs', type=int, nargs='?', default=1,
+                        const=max(1, (os.cpu_count() or 1) // 2),
+                        help=('number of projects to mutate in parallel. Defaults to 1, or to half '
+                            'the number of CPUs if given without a value (leaving cores for the '
+                            'JVMs that PIT forks).'))
+    parser.add_argument('--pit-threads', type=int, default=None,
+                        help=('number of threads each PIT run uses to run mutants. Defaults to the '
+                            'number of CPUs divided by --jobs.'))
+    parser.add_argument('--timeout', type=float, default=600,
+                        help=('seconds after which a project\'s PIT run is killed and reported as '
+                            'failed. 0 for no limit. Defaults to 600.'))
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help=('if given, run PIT even on projects whose cached reports (in '
+                            '$PIT_CACHE, by default $PIT_WORKDIR/.pit-cache) are still valid.'))
     parser.add_argument('-c', '--targetclasses', default=None,
                         help=('set of Java package globs to mutate: '
                             'a list of comma-separated values '
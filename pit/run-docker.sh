@@ -1,4 +1,4 @@
-clonedir=/tmp/mutation-testing
+clonedir=${PIT_WORKDIR:-/tmp/mutation-testing}
 taskfile=tasks.ndjson
 container="pit-runner"
 
@@ -13,7 +13,7 @@ esac
 [[ -z "$taskfile" ]] && echo 'Missing task file argument (-t|--tasks)' && exit 1
 
 [[ -f $taskfile ]] && \
-  ../clone-projects.py $taskfile -p &&
+  PIT_WORKDIR=$clonedir ../clone-projects.py $taskfile -p &&
   docker build \
     --build-arg TASKFILE=$taskfile \
     --build-arg CLONEDIR=$clonedir \
@@ -21,6 +21,7 @@ esac
     -t $container . && \
   docker run \
     -v ${clonedir}:${clonedir} \
+    -e PIT_WORKDIR=${clonedir} \
     -v $PWD:/usr/src/app \
     -d --rm $container
 
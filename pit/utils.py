@@ -1,39 +1,134 @@
 #! /usr/bin/env python3 
 """Miscellaneous utilities for managing PIT output."""
+import io
 import os
-import sys
-import argparse
-import subprocess
-from shutil import rmtree, copytree
-import pandas as pd
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import csv
+
+# pandas is only imported by the functions that aggregate many projects, so
+# the runners don't pay for it when summarising a single project
+
+# statuses PIT reports for mutants the tests detected
+_KILLED = frozenset(('KILLED', 'TIMED_OUT'))
 
 def get_mutation_coverage(resultspath):
     """Gets mutation coverage for the project at resultspath."""
-    names = ['fileName', 'className', 'mutator', 'method', 'lineNumber', \
-            'status', 'killingTest']
     try:
-        mutations = pd.read_csv(resultspath, names=names)
-        if not mutations.empty:
-            killed = ['KILLED', 'TIMED_OUT'] # pylint: disable=unused-variable
-            nkilled = len(mutations.query('status in @killed'))
-            nsurvived = len(mutations) - nkilled
-            coverage = nkilled / len(mutations)
-
-            result = {
-                'mutants': len(mutations),
-                'survived': nsurvived,
-                'killed': nkilled,
-                'mutationCovered': coverage
-            }
-
-            return result
+        with open(resultspath, 'rb') as infile:
+            report = infile.read()
     except FileNotFoundError:
-        pass
+        return None
+
+    if b'"' in report:
+        # quoted fields could hide commas or newlines, so parse properly
+        nmutants = nkilled = 0
+        for row in csv.reader(io.StringIO(report.decode('utf-8', errors='replace'), newline='')):
+            nmutants += 1
+            if row[5] in _KILLED:
+                nkilled += 1
+    else:
+        # one mutant per line; the status is the only field that can be
+        # exactly one of these words
+        nmutants = report.count(b'\n')
+        if report and not report.endswith(b'\n'):
+            nmutants += 1
+        nkilled = sum(report.count(b',' + status.encode() + b',') for status in _KILLED)
+
+    if not nmutants:
+        return None
+    return __summary(nmutants, nkilled)
+
+# PIT operator names for the mutator classes it reports in mutations.csv
+# (PIT 1.5.2). The rv mutators (ABS, AOR1..4, ROR1..5, etc.) and
+# RemoveConditionalMutator_* are worked out from the class name instead.
+_OPERATORS = {
+    'ConditionalsBoundaryMutator': 'CONDITIONALS_BOUNDARY',
+    'ConstructorCallMutator': 'CONSTRUCTOR_CALLS',
+    'IncrementsMutator': 'INCREMENTS',
+    'InlineConstantMutator': 'INLINE_CONSTS',
+    'InvertNegsMutator': 'INVERT_NEGS',
+    'MathMutator': 'MATH',
+    'NegateConditionalsMutator': 'NEGATE_CONDITIONALS',
+    'NonVoidMethodCallMutator': 'NON_VOID_METHOD_CALLS',
+    'ReturnValsMutator': 'RETURN_VALS',
+    'VoidMethodCallMutator': 'VOID_METHOD_CALLS',
+    'BooleanTrueReturnValsMutator': 'TRUE_RETURNS',
+    'BooleanFalseReturnValsMutator': 'FALSE_RETURNS',
+    'EmptyObjectReturnValsMutator': 'EMPTY_RETURNS',
+    'NullReturnValsMutator': 'NULL_RETURNS',
+    'PrimitiveReturnsMutator': 'PRIMITIVE_RETURNS',
+    'MemberVariableMutator': 'EXPERIMENTAL_MEMBER_VARIABLE',
+    'SwitchMutator': 'EXPERIMENTAL_SWITCH'
+}
 
-    return None
+_RV_MUTATOR = re.compile(r'([A-Z]+?)(\d*)Mutator')
 
-def __combiner(resultspath):
-    return pd.Series(get_mutation_coverage(resultspath))
+def operator_names(mutator):
+    """Return the PIT operator names a mutator from mutations.csv belongs to,
+    most specific first, e.g. ('ROR5', 'ROR') for ...rv.ROR5Mutator. Unknown
+    mutators are named by their class."""
+    classname = mutator.rsplit('.', 1)[-1]
+    if classname.startswith('RemoveConditionalMutator_'):
+        return ('REMOVE_CONDITIONALS' + classname[len('RemoveConditionalMutator'):],
+                'REMOVE_CONDITIONALS')
+    if classname in _OPERATORS:
+        return (_OPERATORS[classname],)
+    match = _RV_MUTATOR.fullmatch(classname)
+    if match:
+        return (match.group(1) + match.group(2), match.group(1))
+    return (classname,)
+
+def get_mutation_coverage_by_mutator(resultspath, operators=None):
+    """Gets mutation coverage for each mutation operator in the project at resultspath.
+
+    Args:
+        resultspath (str): Path to a PIT mutations.csv file
+        operators (list): The operator names PIT was run with, e.g. ['ROR', 'AOR1'].
+                          Each mutant is counted under the one it was generated by.
+                          If None, mutants are counted under their operator group
+                          (e.g. ROR rather than ROR5).
+
+    Returns:
+        (dict): Coverage results (as returned by get_mutation_coverage), keyed by
+                operator name, or None if there are no results.
+    """
+    totals = Counter()
+    nkilled = Counter()
+    try:
+        with open(resultspath, newline='') as infile:
+            for row in csv.reader(infile):
+                totals[row[2]] += 1
+                if row[5] in _KILLED:
+                    nkilled[row[2]] += 1
+    except FileNotFoundError:
+        return None
+
+    if not totals:
+        return None
+
+    operators = set(operators or ())
+    mutants = Counter()
+    killed = Counter()
+    for mutator, total in totals.items():
+        names = operator_names(mutator)
+        name = next((n for n in names if n in operators), names[-1])
+        mutants[name] += total
+        killed[name] += nkilled[mutator]
+
+    return {
+        name: __summary(total, killed[name])
+        for name, total in mutants.items()
+    }
+
+def __summary(nmutants, nkilled):
+    return {
+        'mutants': nmutants,
+        'survived': nmutants - nkilled,
+        'killed': nkilled,
+        'mutationCovered': nkilled / nmutants
+    }
 
 def aggregate_mutation_results(dirpath, aggregate=False):
     """
@@ -44,30 +139,32 @@ def aggregate_mutation_results(dirpath, aggregate=False):
         aggregate (bool): Summarise each student's mutation score or return
                           data for all mutants?
     """
+    import pandas as pd
+
     if not os.path.isabs(dirpath):
         dirpath = os.path.abspath(dirpath)
 
-    projects = os.listdir(dirpath)
     resultpaths = {}
 
-    results = []
+    with os.scandir(dirpath) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            mutationscsv = os.path.join(entry.path, 'pitReports', 'mutations.csv')
+            mutationshtml = os.path.join(entry.path, 'pitReports', 'com.example')
 
-    for proj in projects:
-        projpath = os.path.join(dirpath, proj)
-        mutationscsv = os.path.join(projpath, 'pitReports', 'mutations.csv')
-        mutationshtml = os.path.join(projpath, 'pitReports', 'com.example')
+            # are there mutation results to speak of?
+            if os.path.isfile(mutationscsv) and os.path.isdir(mutationshtml):
+                resultpaths[entry.name] = mutationscsv
 
-        # are there mutation results to speak of?
-        if os.path.isfile(mutationscsv) and os.path.isdir(mutationshtml):
-            if aggregate:
-                results.append(pd.read_csv(mutationscsv))
-            else:
-                resultpaths[proj] = mutationscsv
-    
-    if aggregate:
-        return pd.concat(results)
+    # the reports are independent of each other, so read them concurrently
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        if aggregate:
+            return pd.concat(executor.map(pd.read_csv, resultpaths.values()))
+        coverage = [cov or {} for cov in executor.map(get_mutation_coverage, resultpaths.values())]
 
-    mutationcoverage = pd.Series(resultpaths).apply(__combiner)
+    # projects without any mutants still get a (NaN) row
+    mutationcoverage = pd.DataFrame(coverage, index=list(resultpaths))
     mutationcoverage.index.name = 'userName'
     return mutationcoverage
 
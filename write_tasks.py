@@ -5,22 +5,31 @@ Description: Grab sample projects from the specified directory.
 """
 
 import os
-import sys
-import json
 import random
+import argparse
 
-def _printhelp():
-    print("Write paths to projects for mutation testing as JSON tasks.")
-    print('\nRequired arguments:')
-    print('\tinfile: A path to a mutation-results.json file if -s is specified,')
-    print('\t\tor a path to a directory containing projects as subdirectories otherwise.')
-    print('Optional arguments:')
-    print('\tn: The number of successful projects to randomly sample, or omit for all of them.')
-    print('\t\t(Only used if -s is passed.')
-    print('Optional flags:')
-    print('\t-s: Only output paths to projects where mutation testing was successful.')
-    sys.exit(0)
+try:
+    from orjson import loads, dumps as _dumps
 
+    def dumps(obj):
+        return _dumps(obj).decode()
+except ImportError:
+    from json import loads, dumps
+
+def _reservoir_sample(items, k):
+    """Randomly sample k items from an iterable in one pass, holding at most k
+    of them in memory (Algorithm R)."""
+    reservoir = []
+    for i, item in enumerate(items):
+        if i < k:
+            reservoir.append(item)
+        else:
+            j = random.randrange(i + 1)
+            if j < k:
+                reservoir[j] = item
+    # like random.sample, return the sample in random order
+    random.shuffle(reservoir)
+    return reservoir
 
 def write_successful(resultpath, n_projects):
     """Write out paths to projects where mutation testing was successful.
@@ -30,18 +39,17 @@ def write_successful(resultpath, n_projects):
         resultpath (str): Path to a mutation-results.json file
         n_projects (int): The number of projects to print out (randomly sampled)
     """
-    projects = []
-    with open(resultpath, 'r') as infile:
-        for line in infile:
-            data = json.loads(line)
-            if data['success']:
-                projects.append(data['projectPath'])
+    with open(resultpath, 'rb') as infile:
+        results = (loads(line) for line in infile)
+        projects = (data['projectPath'] for data in results if data['success'])
+        if n_projects is None:
+            projects = list(projects)
+        else:
+            projects = _reservoir_sample(projects, int(n_projects))
 
-    if n_projects is not None:
-        projects = random.sample(projects, int(n_projects))
     for item in projects:
         obj = {'projectPath': item}
-        print(json.dumps(obj))
+        print(dumps(obj))
 
 def write_all_projects(dirpath, n_projects=None):
     """Write out paths to all projects within the specified dirpath."""
@@ -54,32 +62,23 @@ def write_all_projects(dirpath, n_projects=None):
         projects = random.sample(projects, int(n_projects))
     for item in projects:
         obj = {'projectPath': os.path.join(dirpath,item)}
-        print(json.dumps(obj))
+        print(dumps(obj))
 
 
 if __name__ == '__main__':
-    ARGS = sys.argv[1:]
+    parser = argparse.ArgumentParser(
+            description='Write paths to projects for mutation testing as JSON tasks.'
+        )
+    parser.add_argument('infile',
+                        help=('a path to a mutation-results.ndjson file if -s is given, or a path '
+                            'to a directory containing projects as subdirectories otherwise.'))
+    parser.add_argument('n', type=int, nargs='?', default=None,
+                        help='the number of projects to randomly sample. Omit for all of them.')
+    parser.add_argument('-s', '--successful', action='store_true',
+                        help='only output paths to projects where mutation testing was successful.')
+    args = parser.parse_args()
 
-    if not ARGS or any(x in ARGS for x in ['-h', '--help']):
-        _printhelp()
-
-    # grab a sample of successful projects?
-    SUCCESSFUL = False
-    if '-s' in ARGS:
-        SUCCESSFUL = True
-        ARGS.remove('-s')
-
-    INFILE = ARGS[0]
-    if SUCCESSFUL:
-        try:
-            N_PROJECTS = ARGS[2]
-            write_successful(INFILE, N_PROJECTS)
-        except IndexError:
-            write_successful(INFILE, None)
+    if args.successful:
+        write_successful(args.infile, args.n)
     else:
-        try:
-            N_PROJECTS = ARGS[2]
-            write_all_projects(INFILE, N_PROJECTS)
-        except IndexError:
-            write_all_projects(INFILE, None)
-
+        write_all_projects(args.infile, args.n)